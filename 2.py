@@ -1,53 +1,113 @@
 import requests
-import csv
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
 import time
+import functools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pytz
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it calculate_pcr uses the vectorized pcr_cumsum instead.
+    njit = None
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.nseindia.com',
+}
+
+# One session for the whole run so connections to NSE are kept alive between polls.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=Retry(total=3, backoff_factor=0.3)))
+SESSION.headers.update(HEADERS)
+
+# Seconds between two polls of NSE.
+POLL_INTERVAL = 30
+
+# Strike ranges are counted in 50-point steps either side of the current price.
+STRIKE_RANGES = tuple(range(1, 31))
+STRIKE_THRESHOLDS = np.array(STRIKE_RANGES, dtype=np.float64) * 50
+PCR_KEYS = tuple(f'pcr{x}' for x in STRIKE_RANGES)
+DIFF_KEYS = tuple(f'difference{x}' for x in STRIKE_RANGES)
+CSV_HEADER = ('Timestamp',) + PCR_KEYS + DIFF_KEYS + ('s1', 's2', 's3', 'r1', 'r2', 'r3', 'Price', 'VWAP')
+CSV_HEADER_LINE = ','.join(CSV_HEADER) + '\r\n'
+
+# Option chain rows for one expiry as parallel arrays, one entry per strike.
+OptionChain = namedtuple('OptionChain', ['strikes', 'ce_coi', 'pe_coi', 'ce_oi', 'pe_oi'])
+
+# Result of the last calculate_pcr call, reused while the price stays between
+# the same strikes and the change in OI is unchanged.
+_pcr_cache = {'key': None, 'ce_coi': None, 'pe_coi': None, 'result': None}
+
+# The CSV stays open for the whole run and every row is flushed as soon as it is
+# written, so the plotting scripts see it and a killed poller loses nothing.
+_writer_state = {'fh': None}
+
+# Returned by fetch_option_chain_data when NSE answers 304 Not Modified.
+UNCHANGED = object()
+_chain_validators = {'etag': None, 'last_modified': None}
+
+# Both fetches are pure I/O wait on the same host, so they run side by side.
+EXECUTOR = ThreadPoolExecutor(max_workers=2)
 
 def fetch_nifty_data():
     """Fetches NIFTY data including volume from NSE."""
     url = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Referer': 'https://www.nseindia.com',
-    }
-
-    session = requests.Session()
-    session.headers.update(headers)
 
     try:
-        response = session.get(url)
+        response = SESSION.get(url, timeout=5)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         return data
     except requests.exceptions.RequestException as e:
         print(f"Error fetching NIFTY data: {e}")
         return None
+    except ValueError:
+        print("NIFTY response content is not valid JSON.")
+        return None
 
-def fetch_option_chain_data():
-    """Fetches the option chain data from NSE using web scraping."""
+def prime_session():
+    """Visits the option chain page so the shared session holds the cookies NSE expects on API calls."""
     url = "https://www.nseindia.com/option-chain"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Referer': 'https://www.nseindia.com',
-    }
-
-    session = requests.Session()
-    session.headers.update(headers)
 
     try:
-        response = session.get(url)
-        cookies = response.cookies.get_dict()
+        SESSION.get(url, timeout=5)
+    except requests.exceptions.RequestException as e:
+        print(f"Error priming NSE session: {e}")
 
-        option_chain_url = "https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY"
-        response = session.get(option_chain_url, headers=headers, cookies=cookies)
+def fetch_option_chain_data():
+    """Fetches the option chain data from NSE using the primed session, or UNCHANGED if NSE reports no update."""
+    option_chain_url = "https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY"
+
+    # Send the validators of the last chain so NSE can answer 304 when nothing changed.
+    conditional_headers = {}
+    if _chain_validators['etag']:
+        conditional_headers['If-None-Match'] = _chain_validators['etag']
+    if _chain_validators['last_modified']:
+        conditional_headers['If-Modified-Since'] = _chain_validators['last_modified']
+
+    try:
+        response = SESSION.get(option_chain_url, headers=conditional_headers, timeout=5)
+        if response.status_code in (401, 403):
+            # The NSE cookies have expired, so prime the session again and retry once.
+            prime_session()
+            response = SESSION.get(option_chain_url, headers=conditional_headers, timeout=5)
+        if response.status_code == 304:
+            return UNCHANGED
         response.raise_for_status()
-        data = response.json()
-        return data['records']['data']
+        data = orjson.loads(response.content)
+        option_chain_data = data['records']['data']
+        _chain_validators['etag'] = response.headers.get('ETag')
+        _chain_validators['last_modified'] = response.headers.get('Last-Modified')
+        return option_chain_data
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
     except requests.exceptions.RequestException as req_err:
@@ -57,50 +117,103 @@ def fetch_option_chain_data():
     print("Failed to fetch option chain data after multiple attempts.")
     return None
 
-def filter_strike_prices(option_chain_data, current_price, strike_range, expiry_date):
-    """Filters the option chain data to include specified ranges of strike prices."""
-    strike_prices = sorted(set([data['strikePrice'] for data in option_chain_data]))
-    filtered_data = {}
-    for x in strike_range:
-        filtered_strikes = [price for price in strike_prices if current_price - x * 50 <= price <= current_price + x * 50]
-        filtered_data[x] = [data for data in option_chain_data if data['strikePrice'] in filtered_strikes and data['expiryDate'] == expiry_date]
-    return filtered_data
-
-def calculate_pcr(filtered_data):
-    """Calculates the PCR (Put-Call Ratio) for different ranges from the filtered option chain data."""
-    pcr_values = {}
-    difference_values = {}
-
-    for x, data in filtered_data.items():
-        call_data = [d['CE'] for d in data if 'CE' in d]
-        put_data = [d['PE'] for d in data if 'PE' in d]
-
-        total_pe_open_interest = sum(float(d["changeinOpenInterest"]) for d in put_data)
-        total_ce_open_interest = sum(float(d["changeinOpenInterest"]) for d in call_data)
-
-        pcr = total_pe_open_interest / total_ce_open_interest if total_ce_open_interest != 0 else 0
-        difference = total_pe_open_interest - total_ce_open_interest
-
-        pcr_values[f'pcr{x}'] = pcr
-        difference_values[f'difference{x}'] = difference
-
+def fetch_all():
+    """Fetches the NIFTY data and the option chain data concurrently."""
+    nifty_future = EXECUTOR.submit(fetch_nifty_data)
+    option_chain_future = EXECUTOR.submit(fetch_option_chain_data)
+    return nifty_future.result(), option_chain_future.result()
+
+def to_soa(option_chain_data, expiry_date):
+    """Converts the option chain rows of one expiry into NumPy arrays, parsing every number once."""
+    chain = [data for data in option_chain_data if data['expiryDate'] == expiry_date]
+    size = len(chain)
+
+    def column(side, field, missing):
+        return np.fromiter((float(data[side][field]) if side in data else missing for data in chain), dtype=np.float32, count=size)
+
+    # A missing side adds nothing to the change in OI and can never be a support/resistance level.
+    return OptionChain(
+        strikes=np.fromiter((data['strikePrice'] for data in chain), dtype=np.int32, count=size),
+        ce_coi=column('CE', 'changeinOpenInterest', 0.0),
+        pe_coi=column('PE', 'changeinOpenInterest', 0.0),
+        ce_oi=column('CE', 'openInterest', np.nan),
+        pe_oi=column('PE', 'openInterest', np.nan),
+    )
+
+def selection_key(strikes, current_price):
+    """Returns a key that is equal for two calls selecting the same strikes in every range."""
+    if current_price % 50 and not (strikes % 50).any():
+        # With strikes on the 50-point grid, every price strictly between two
+        # grid points selects the same strikes for every range.
+        return strikes.tobytes(), 'bucket', current_price // 50
+    return strikes.tobytes(), 'price', current_price
+
+def pcr_kernel(strikes, ce_coi, pe_coi, current_price, thresholds):
+    """Sums the change in OI of the strikes within each threshold of the price into PCR and PE - CE difference arrays."""
+    pcr = np.empty(thresholds.size)
+    difference = np.empty(thresholds.size)
+    for i in range(thresholds.size):
+        threshold = thresholds[i]
+        ce_total = np.float64(0.0)
+        pe_total = np.float64(0.0)
+        for j in range(strikes.size):
+            if abs(strikes[j] - current_price) <= threshold:
+                ce_total += ce_coi[j]
+                pe_total += pe_coi[j]
+        pcr[i] = pe_total / ce_total if ce_total != 0 else 0.0
+        difference[i] = pe_total - ce_total
+    return pcr, difference
+
+def pcr_cumsum(strikes, ce_coi, pe_coi, current_price, thresholds):
+    """Vectorized NumPy equivalent of pcr_kernel, used when numba is not installed."""
+    # Every range is a prefix of the strikes sorted by distance from the price,
+    # so one sort plus cumulative sums answers all ranges at once.
+    distance = np.abs(strikes - current_price)
+    order = np.argsort(distance, kind='stable')
+    ce_cumsum = np.concatenate(([0.0], ce_coi[order].cumsum(dtype=np.float64)))
+    pe_cumsum = np.concatenate(([0.0], pe_coi[order].cumsum(dtype=np.float64)))
+    counts = np.searchsorted(distance[order], thresholds, side='right')
+
+    total_pe_open_interest = pe_cumsum[counts]
+    total_ce_open_interest = ce_cumsum[counts]
+
+    pcr = np.zeros(thresholds.size)
+    np.divide(total_pe_open_interest, total_ce_open_interest, out=pcr, where=total_ce_open_interest != 0)
+    return pcr, total_pe_open_interest - total_ce_open_interest
+
+# The loop only pays off compiled; as plain Python it is far slower than pcr_cumsum.
+pcr_totals = njit(fastmath=True, cache=True)(pcr_kernel) if njit is not None else pcr_cumsum
+
+def calculate_pcr(chain, current_price):
+    """Calculates the PCR (Put-Call Ratio) for different ranges of strike prices around the current price."""
+    key = selection_key(chain.strikes, current_price)
+    if key == _pcr_cache['key'] and np.array_equal(chain.ce_coi, _pcr_cache['ce_coi']) and np.array_equal(chain.pe_coi, _pcr_cache['pe_coi']):
+        return _pcr_cache['result']
+
+    pcr, difference = pcr_totals(chain.strikes, chain.ce_coi, chain.pe_coi, current_price, STRIKE_THRESHOLDS)
+
+    pcr_values = dict(zip(PCR_KEYS, pcr.tolist()))
+    difference_values = dict(zip(DIFF_KEYS, difference.tolist()))
+
+    _pcr_cache.update(key=key, ce_coi=chain.ce_coi, pe_coi=chain.pe_coi, result=(pcr_values, difference_values))
     return pcr_values, difference_values
 
-def calculate_support_resistance(option_chain_data):
+def top_strikes(strikes, open_interest, count=3):
+    """Returns the strikes with the highest open interest, highest first and padded with None."""
+    candidates = np.flatnonzero(~np.isnan(open_interest))
+    values = open_interest[candidates]
+    if values.size > count:
+        # Keep everything tied with the count-th largest so ties resolve in chain order below.
+        threshold = np.partition(values, values.size - count)[values.size - count]
+        keep = values >= threshold
+        candidates, values = candidates[keep], values[keep]
+    top = candidates[np.argsort(-values, kind='stable')[:count]]
+    return ([int(strike) for strike in strikes[top]] + [None] * count)[:count]
+
+def calculate_support_resistance(chain):
     """Calculates the support and resistance levels (s1, s2, s3, r1, r2, r3)."""
-    put_data = [data['PE'] for data in option_chain_data if 'PE' in data]
-    call_data = [data['CE'] for data in option_chain_data if 'CE' in data]
-
-    put_data.sort(key=lambda d: float(d['openInterest']), reverse=True)
-    call_data.sort(key=lambda d: float(d['openInterest']), reverse=True)
-
-    s1 = put_data[0]['strikePrice'] if put_data else None
-    s2 = put_data[1]['strikePrice'] if len(put_data) > 1 else None
-    s3 = put_data[2]['strikePrice'] if len(put_data) > 2 else None
-
-    r1 = call_data[0]['strikePrice'] if call_data else None
-    r2 = call_data[1]['strikePrice'] if len(call_data) > 1 else None
-    r3 = call_data[2]['strikePrice'] if len(call_data) > 2 else None
+    s1, s2, s3 = top_strikes(chain.strikes, chain.pe_oi)
+    r1, r2, r3 = top_strikes(chain.strikes, chain.ce_oi)
 
     return s1, s2, s3, r1, r2, r3
 
@@ -120,16 +233,22 @@ def calculate_vwap(nifty_data):
     
     return vwap
 
+def format_cell(value):
+    """Formats one CSV cell; every value is a number, a plain string or None, so nothing needs quoting."""
+    return '' if value is None else str(value)
+
 def append_to_csv(file_path, pcr_values, difference_values, timestamp, s1, s2, s3, r1, r2, r3, current_price, vwap):
     """Appends the PCR values, differences, timestamp, strike prices, current price, and VWAP to a CSV file."""
     try:
-        with open(file_path, mode='a', newline='') as file:
-            writer = csv.writer(file)
+        if _writer_state['fh'] is None:
+            file = open(file_path, mode='a', newline='', buffering=1 << 16)
+            atexit.register(file.close)
+            _writer_state['fh'] = file
             if file.tell() == 0:
-                headers = ['Timestamp'] + list(pcr_values.keys()) + list(difference_values.keys()) + ['s1', 's2', 's3', 'r1', 'r2', 'r3', 'Price', 'VWAP']
-                writer.writerow(headers)
-            row = [timestamp] + list(pcr_values.values()) + list(difference_values.values()) + [s1, s2, s3, r1, r2, r3, current_price, vwap]
-            writer.writerow(row)
+                file.write(CSV_HEADER_LINE)
+        row = [timestamp, *pcr_values.values(), *difference_values.values(), s1, s2, s3, r1, r2, r3, current_price, vwap]
+        _writer_state['fh'].write(','.join(map(format_cell, row)) + '\r\n')
+        _writer_state['fh'].flush()
         print(f"Data has been appended to {file_path}")
     except IOError:
         print("I/O error")
@@ -153,9 +272,15 @@ def print_latest_data(pcr_values, difference_values, s1, s2, s3, r1, r2, r3, cur
     for key, value in difference_values.items():
         print(f"{key}: {value:.4f}")
 
+def next_poll_time(previous_tick):
+    """Returns the first tick of the polling schedule after previous_tick that has not passed yet."""
+    missed = max(0, int((time.time() - previous_tick) // POLL_INTERVAL))
+    return previous_tick + (missed + 1) * POLL_INTERVAL
+
 def main():
     """Main function to fetch, filter, calculate ratios, and write option chain data to a CSV file periodically."""
-    nifty_data = fetch_nifty_data()
+    prime_session()
+    nifty_data, option_chain_data = fetch_all()
     if nifty_data is None or 'data' not in nifty_data or len(nifty_data['data']) == 0:
         print("Failed to fetch NIFTY data. Exiting...")
         return
@@ -163,7 +288,6 @@ def main():
     current_price = float(nifty_data['data'][0]['lastPrice'])
     print(f"Current NIFTY Price: {current_price}")
 
-    option_chain_data = fetch_option_chain_data()
     if option_chain_data is None:
         print("Failed to fetch option chain data. Exiting...")
         return
@@ -176,35 +300,47 @@ def main():
         print("Invalid expiry date. Please enter a valid date from the list.")
         return
 
+    # The expiry is fixed for the whole run, so bind it into the chain loader once.
+    load_chain = functools.partial(to_soa, expiry_date=expiry_date_input)
+
     current_date = datetime.now().strftime('%Y-%m-%d')
     output_file_path = f'realtime_pcr_data_{current_date}_expiry_{expiry_date_input}.csv'
 
-    strike_ranges = [1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,29,30]
+    chain = load_chain(option_chain_data)
+    levels = calculate_support_resistance(chain)
 
     prev_pcr_values = None
     ist_price = float(nifty_data['data'][0]['lastPrice'])
     old_vwap = calculate_vwap(nifty_data)
 
+    tick = time.time()
 
     while True:
-        nifty_data = fetch_nifty_data()
+        # Polls follow a fixed schedule, so the time spent fetching and writing
+        # does not push every later sample back.
+        time.sleep(max(0, tick - time.time()))
+        sampled_at = time.time()
+        tick = next_poll_time(tick)
+
+        nifty_data, option_chain_data = fetch_all()
         if nifty_data is None or 'data' not in nifty_data or len(nifty_data['data']) == 0:
             print("Failed to fetch NIFTY data. Skipping this iteration...")
-            time.sleep(30)
             continue
 
         current_price = float(nifty_data['data'][0]['lastPrice'])
-        option_chain_data = fetch_option_chain_data()
         if option_chain_data is None:
             print("Failed to fetch option chain data. Skipping this iteration...")
-            time.sleep(30)
             continue
 
-        filtered_data = filter_strike_prices(option_chain_data, current_price, strike_ranges, expiry_date_input)
+        # An unchanged chain keeps the previous chain and levels; the PCR still follows the new price.
+        if option_chain_data is not UNCHANGED:
+            # Only the chosen expiry matters downstream, so drop the other expiries once per fetch.
+            chain = load_chain(option_chain_data)
+            levels = calculate_support_resistance(chain)
 
-        pcr_values, difference_values = calculate_pcr(filtered_data)
+        pcr_values, difference_values = calculate_pcr(chain, current_price)
 
-        s1, s2, s3, r1, r2, r3 = calculate_support_resistance(option_chain_data)
+        s1, s2, s3, r1, r2, r3 = levels
 
         vwapdiff = calculate_vwap(nifty_data)
         vwap = (old_vwap - vwapdiff) + ist_price
@@ -216,7 +352,7 @@ def main():
             vwap_value = vwap
 
         ist = pytz.timezone('Asia/Kolkata')
-        timestamp = datetime.now(ist).strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = datetime.fromtimestamp(sampled_at, ist).strftime('%Y-%m-%d %H:%M:%S')
 
         print_latest_data(pcr_values, difference_values, s1, s2, s3, r1, r2, r3, current_price, vwap_value, prev_pcr_values)
 
@@ -224,7 +360,5 @@ def main():
 
         prev_pcr_values = pcr_values.copy()
 
-        time.sleep(30)
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,12 @@
+import importlib.util
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Only saving to file, no interactive window
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
+import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 import numpy as np
 from datetime import datetime
 import matplotlib.colors as mcolors
@@ -10,26 +16,32 @@ today_date = datetime.now().strftime('%Y-%m-%d')
 expiry_date = '08-Aug-2024'  # Correct expiry date format
 input_filename = f'realtime_pcr_data_{today_date}_expiry_{expiry_date}.csv'
 
-# Read the CSV file
-df = pd.read_csv(input_filename)
-
-# Convert Timestamp to datetime
-df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+# Read the CSV file, parsing Timestamp while reading (pyarrow's parser when it is installed)
+csv_engine = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+df = pd.read_csv(input_filename, engine=csv_engine, parse_dates=['Timestamp'])
 
 # Select difference columns (from 32nd column to 6th from last)
 difference_columns = df.columns[31:-6]
 
+# Draw long paths in chunks so Agg does not stall on full-day CSVs
+plt.rcParams['agg.path.chunksize'] = 10000
+
 # Create a colormap
 cmap = plt.get_cmap('viridis')
 color_norm = mcolors.Normalize(vmin=0, vmax=len(difference_columns)-1)
 
 # Create the plot
 plt.figure(figsize=(20, 10))
+ax = plt.gca()
 
-# Plot each difference column with gradient color
-for i, column in enumerate(difference_columns):
-    color = cmap(color_norm(i))
-    plt.plot(df['Timestamp'], df[column], label=column, color=color, linewidth=2)
+# Draw every difference column as one LineCollection with gradient colors
+timestamps = mdates.date2num(df['Timestamp'])
+values = df[difference_columns].to_numpy(dtype=float).T
+segments = np.stack([np.broadcast_to(timestamps, values.shape), values], axis=-1)
+colors = cmap(color_norm(np.arange(len(difference_columns))))
+ax.add_collection(LineCollection(segments, colors=colors, linewidths=2, rasterized=True))
+ax.xaxis_date()
+ax.autoscale()
 
 # Customize the plot
 plt.title('Timestamp vs Difference', fontsize=16)
@@ -57,13 +69,14 @@ plt.axhline(y=0, color='r', linestyle='-', linewidth=0.5)
 
 # Adjust layout and add legend
 plt.tight_layout()
-plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+legend_handles = [Line2D([], [], color=color, linewidth=2) for color in colors]
+plt.legend(legend_handles, difference_columns, bbox_to_anchor=(1.05, 1), loc='upper left')
 
 # Generate output filename
 output_filename = f'realtime_pcr_data_{today_date}_expiry_{expiry_date}_graph.png'
 
 # Save the plot
-plt.savefig(output_filename, bbox_inches='tight', dpi=300)
+plt.savefig(output_filename, bbox_inches='tight', dpi=150)
 
 print(f"Graph saved as {output_filename}")
 print(f"Y-axis range: {y_min:.2f} to {y_max:.2f}")
\ No newline at end of file
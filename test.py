@@ -2,6 +2,18 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
 import os
+import importlib.util
+import matplotlib.dates as mdates
+
+# datashader is optional; without it the lines are drawn by matplotlib directly
+try:
+    import datashader as ds
+    import datashader.transfer_functions as tf
+except ImportError:
+    ds = None
+
+# Resolution of the saved graph
+SAVE_DPI = 300
 
 # File name
 input_filename = 'realtime_pcr_data_2024-07-30_expiry_01-Aug-2024.csv'
@@ -15,24 +27,41 @@ if not os.path.exists(input_filename):
         print(file)
     exit(1)
 
-# Read the CSV file
+# Read the CSV file, parsing Timestamp while reading (pyarrow's parser when it is installed)
+csv_engine = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
 try:
-    df = pd.read_csv(input_filename)
+    df = pd.read_csv(input_filename, engine=csv_engine, parse_dates=['Timestamp'])
 except Exception as e:
     print(f"Error reading the CSV file: {e}")
     exit(1)
 
-# Convert Timestamp to datetime
-df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-
 # Create the plot
 plt.figure(figsize=(20, 10))
 
-# Plot Price
-plt.plot(df['Timestamp'], df['Price'], label='Price', color='blue', linewidth=2)
-
-# Plot VWAP
-plt.plot(df['Timestamp'], df['VWAP'], label='VWAP', color='red', linewidth=2)
+# Datashader needs a non-empty range on both axes; one row or flat data is drawn by matplotlib
+times = mdates.date2num(df['Timestamp'])
+values = df[['Price', 'VWAP']]
+use_datashader = ds is not None and times.min() < times.max() and values.min().min() < values.max().max()
+
+if use_datashader:
+    # Pad both ranges by matplotlib's default 5% margin so lines are not clipped by the spines
+    x_margin = (times.max() - times.min()) * 0.05
+    y_margin = (values.max().max() - values.min().min()) * 0.05
+    x_range = (times.min() - x_margin, times.max() + x_margin)
+    y_range = (values.min().min() - y_margin, values.max().max() + y_margin)
+    plt.xlim(x_range)
+    plt.ylim(y_range)
+    plt.gca().xaxis_date()
+
+    # Empty lines so the legend still shows both series; the lines are rasterized once the layout is final
+    plt.plot([], [], label='Price', color='blue', linewidth=2)
+    plt.plot([], [], label='VWAP', color='red', linewidth=2)
+else:
+    # Plot Price
+    plt.plot(df['Timestamp'], df['Price'], label='Price', color='blue', linewidth=2)
+
+    # Plot VWAP
+    plt.plot(df['Timestamp'], df['VWAP'], label='VWAP', color='red', linewidth=2)
 
 # Customize the plot
 plt.title('Price and VWAP over Time', fontsize=16)
@@ -55,10 +84,24 @@ plt.legend()
 # Adjust layout
 plt.tight_layout()
 
+if use_datashader:
+    # Rasterize Price and VWAP at the axes' size in output pixels, spread to the 2pt line width
+    ax = plt.gca()
+    scale = SAVE_DPI / plt.gcf().dpi
+    bbox = ax.get_window_extent()
+    spread_px = round(2 * SAVE_DPI / 72 / 2)
+    frame = pd.DataFrame({'Time': times, 'Price': df['Price'], 'VWAP': df['VWAP']})
+    canvas = ds.Canvas(plot_width=int(bbox.width * scale), plot_height=int(bbox.height * scale), x_range=x_range, y_range=y_range)
+    image = tf.stack(
+        tf.spread(tf.shade(canvas.line(frame, 'Time', 'Price'), cmap=['blue']), px=spread_px),
+        tf.spread(tf.shade(canvas.line(frame, 'Time', 'VWAP'), cmap=['red']), px=spread_px),
+    )
+    ax.imshow(image.to_pil(), extent=[*x_range, *y_range], aspect='auto', interpolation='nearest')
+
 # Generate output filename
 output_filename = 'price_vwap_graph_2024-07-30_expiry_01-Aug-2024.png'
 
 # Save the plot
-plt.savefig(output_filename, bbox_inches='tight', dpi=300)
+plt.savefig(output_filename, bbox_inches='tight', dpi=SAVE_DPI)
 
 print(f"Graph saved as {output_filename}")
\ No newline at end of file